@@ -2,6 +2,7 @@
 # /// script
 # dependencies = [
 #   "beautifulsoup4",
+#   "lxml",
 # ]
 # ///
 
@@ -10,42 +11,185 @@ Add source attributions to TypeRacer texts by fetching from typeracerdata.com
 """
 
 import argparse
+import gzip
+import http.client
+import json
+import os
+import re
+import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from html import unescape
+from importlib.util import find_spec
 from pathlib import Path
-from urllib.request import urlopen
-from bs4 import BeautifulSoup
+from urllib.error import HTTPError
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+HOST = "typeracerdata.com"
+REQUEST_HEADERS = {
+    "Accept-Encoding": "gzip",
+    "Connection": "keep-alive",
+    "User-Agent": "just-type-it/add_sources",
+}
+PREAMBLE_SCAN_BYTES = 4096  # A preamble always fits well within one page
+SCAN_WORKERS = 16  # Threads used to check files for preambles concurrently
+CONCURRENT_REQUESTS = 8  # Max requests in flight when --delay is 0
+SLOW_RESPONSE_SECONDS = 10.0  # Request->response time that triggers a back-off
+READ_BLOCKED_SECONDS = 0.1  # A read this long was still waiting on the server, not just draining a buffer
+INDEX_FILE = ".add_sources_index.json"  # Cache of preambled files, kept out of the library like .fix_progress.json
+
+# The source is in a <p> tag that starts with "—from" or "from"
+# Example: <p>&mdash;from <em>Whisper of the Heart</em>, a movie by Yoshifumi Kondō</p>
+# Only the tag names ignore case; "from" is matched exactly, like the soup fallback does.
+# The capture stops at the next <p>, so an unclosed paragraph doesn't swallow the
+# markup after it; such pages are left to the soup fallback.
+SOURCE_RE = re.compile(
+    rb'(?i:<p)(?:\s[^>]*)?>\s*(?:&mdash;|&#8212;|\xe2\x80\x94)?\s*from\s+((?:(?!(?i:<p[\s>])).)*?)(?i:</p>)',
+    re.DOTALL,
+)
+TAG_RE = re.compile(rb'<[^>]+>')
+
+# Fallback parsing only needs <p> tags; lxml is much faster than html.parser
+PARAGRAPHS_ONLY = SoupStrainer('p')
+SOUP_PARSER = 'lxml' if find_spec('lxml') else 'html.parser'
+
+# Keep-alive connection per thread so every request reuses one TCP+TLS session
+_local = threading.local()
+
+# has_preamble results keyed by (st_dev, st_ino, st_mtime_ns)
+_preamble_cache: dict[tuple[int, int, int], bool] = {}
+
+
+def has_preamble(file_path: Path, stat_result: os.stat_result | None = None) -> bool:
+    """
+    Check if a text file already has a preamble (contains '---' on its own line).
+    Results are memoized per (device, inode, mtime), so rescans and symlinked
+    duplicates don't reopen the same file. Pass stat_result to skip the stat.
+    """
+    if stat_result is None:
+        stat_result = file_path.stat()
+    key = (stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns)
+
+    result = _preamble_cache.get(key)
+    if result is None:
+        # The preamble is always at the top, so only read the head of the file
+        with open(file_path, 'rb') as f:
+            head = f.read(PREAMBLE_SCAN_BYTES)
+        result = _preamble_cache[key] = b'\n---\n' in head
+    return result
 
 
-def has_preamble(file_path: Path) -> bool:
-    """Check if a text file already has a preamble (contains '---' on its own line)"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-        return '\n---\n' in content
+def load_all_indexes() -> dict[str, dict[str, int]]:
+    """Load the index file from the working directory: {texts directory: {stem: mtime_ns}}"""
+    if Path(INDEX_FILE).exists():
+        with open(INDEX_FILE, 'r') as f:
+            return json.load(f)
+    return {}
 
 
-def get_text_id_from_filename(file_path: Path) -> str:
-    """Extract the text ID from the filename (e.g., '3551496.txt' -> '3551496')"""
-    return file_path.stem
+def load_index(texts_dir: Path) -> dict[str, int]:
+    """Load the {stem: mtime_ns} index of files in texts_dir already known to have a preamble"""
+    return load_all_indexes().get(str(texts_dir.resolve()), {})
 
 
-def fetch_source_from_url(text_id: str) -> tuple[str | None, float]:
+def save_index(texts_dir: Path, index: dict[str, int]):
     """
-    Fetch the source attribution from typeracerdata.com
-    Returns (source, request_time_seconds)
-    Raises exception on HTTP errors (will stop the script)
+    Save the preamble index for texts_dir atomically so an interrupted run can't corrupt it.
+    The index lives in the working directory, never in texts_dir itself, because texts_dir
+    doubles as a --library that just_type_it.py picks lessons from.
     """
-    url = f"https://typeracerdata.com/text?id={text_id}"
+    indexes = load_all_indexes()
+    indexes[str(texts_dir.resolve())] = index
+    tmp_path = INDEX_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(indexes, f)
+    os.replace(tmp_path, INDEX_FILE)
+
+    # Earlier versions kept the index inside the library, where it could be picked as a lesson
+    legacy_path = texts_dir / INDEX_FILE
+    if legacy_path.exists():
+        os.remove(legacy_path)
+
+
+def check_file(file_path: Path, known: dict[str, int]) -> tuple[bool, int]:
+    """
+    Check a file for a preamble, trusting the index if the file is unchanged.
+    Returns (has_preamble, mtime_ns)
+    """
+    stat_result = file_path.stat()
+    if known.get(file_path.stem) == stat_result.st_mtime_ns:
+        return (True, stat_result.st_mtime_ns)
+    return (has_preamble(file_path, stat_result), stat_result.st_mtime_ns)
 
-    start_time = time.time()
-    with urlopen(url) as response:
-        # Use 'replace' to handle invalid UTF-8 bytes gracefully
-        html = response.read().decode('utf-8', errors='replace')
-    request_time = time.time() - start_time
 
-    soup = BeautifulSoup(html, 'html.parser')
+def get_connection() -> http.client.HTTPSConnection:
+    """Get this thread's connection to typeracerdata.com, creating it on first use"""
+    conn = getattr(_local, 'connection', None)
+    if conn is None:
+        conn = _local.connection = http.client.HTTPSConnection(HOST, timeout=30)
+    return conn
+
+
+def send_request(path: str) -> http.client.HTTPSConnection:
+    """
+    Send a GET for a path on this thread's keep-alive connection without
+    waiting for the response. Reconnects and resends once if the server
+    dropped the idle connection. Returns the connection to read from.
+    """
+    conn = get_connection()
+    try:
+        conn.request("GET", path, headers=REQUEST_HEADERS)
+    except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+        # Server closed the keep-alive socket between requests - reconnect once
+        conn.close()
+        conn.request("GET", path, headers=REQUEST_HEADERS)
+    return conn
+
+
+def read_response(conn: http.client.HTTPSConnection, path: str) -> bytes:
+    """
+    Read the response to a request sent with send_request.
+    Raises HTTPError on non-200 responses.
+    """
+    try:
+        response = conn.getresponse()
+    except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+        # Server closed the socket before answering - reconnect and resend once
+        conn.close()
+        conn.request("GET", path, headers=REQUEST_HEADERS)
+        response = conn.getresponse()
+
+    # Always drain the body so the connection can be reused
+    body = response.read()
+    if response.status != 200:
+        raise HTTPError(f"https://{HOST}{path}", response.status, response.reason, response.headers, None)
+    if response.getheader("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return body
+
+
+def find_source_with_regex(html: bytes) -> str | None:
+    """Find the source attribution with a byte-level regex scan (no DOM build)"""
+    match = SOURCE_RE.search(html)
+    if not match:
+        return None
+
+    # Strip inline tags like <em> and decode only the captured attribution
+    source = TAG_RE.sub(b'', match.group(1)).decode('utf-8', errors='replace')
+    return unescape(source).strip() or None
+
+
+def find_source_with_soup(html: bytes) -> str | None:
+    """Find the source attribution by parsing the full page with BeautifulSoup"""
+    # Hand over the raw bytes with a known encoding: no decode round trip here
+    # and no charset sniffing inside BeautifulSoup
+    soup = BeautifulSoup(html, SOUP_PARSER, from_encoding='utf-8', parse_only=PARAGRAPHS_ONLY)
 
     # The source is in a <p> tag that contains "—from" or starts with "from"
-    # Example: <p>&mdash;from <em>Whisper of the Heart</em>, a movie by Yoshifumi Kondō</p>
     for p in soup.find_all('p'):
         text = p.get_text().strip()
         # Check if this looks like a source attribution
@@ -53,23 +197,74 @@ def fetch_source_from_url(text_id: str) -> tuple[str | None, float]:
             # Remove the "—from" or "from" prefix and clean up
             source = text.replace('—from', '').replace('from', '', 1).strip()
             if source:
-                return (source, request_time)
+                return source
 
-    # If we can't find it, return None
-    return (None, request_time)
+    return None
+
+
+def fetch_source_from_url(text_id: str, delay: float = 0.0) -> tuple[str | None, float, bool]:
+    """
+    Fetch the source attribution from typeracerdata.com
+    If delay is given, the request is sent first and the response read after
+    sleeping, so the server builds the page during our politeness delay.
+    Returns (source, request_time_seconds, slow). The time runs from sending the
+    request to having the response, delay included, since the server keeps
+    working while we sleep. slow is set when that took over SLOW_RESPONSE_SECONDS
+    and the server still wasn't done when the delay ended.
+    Raises exception on HTTP errors (will stop the script)
+    """
+    path = f"/text?id={text_id}"
+
+    start_time = time.time()
+    conn = send_request(path)
+    if delay > 0:
+        time.sleep(delay)
+    read_start = time.time()
+    html = read_response(conn, path)
+    end_time = time.time()
+
+    request_time = end_time - start_time
+    # A response that arrived during the delay isn't the server being slow
+    still_waiting = end_time - read_start > READ_BLOCKED_SECONDS
+    slow = still_waiting and request_time > SLOW_RESPONSE_SECONDS
+
+    # Try the cheap regex first and only build a full soup if it misses
+    source = find_source_with_regex(html) or find_source_with_soup(html)
+    return (source, request_time, slow)
+
+
+def fetch_sources_concurrently(pool: ThreadPoolExecutor, text_ids: list[str], in_flight: int):
+    """
+    Yield fetch_source_from_url results in order, keeping up to `in_flight`
+    requests running ahead. Nothing new is submitted while the caller is busy
+    (e.g. sleeping after a slow response), so backing off still works.
+    """
+    remaining_ids = iter(text_ids)
+    pending = deque(
+        pool.submit(fetch_source_from_url, text_id)
+        for text_id in islice(remaining_ids, in_flight)
+    )
+    while pending:
+        result = pending.popleft().result()
+        for text_id in islice(remaining_ids, 1):
+            pending.append(pool.submit(fetch_source_from_url, text_id))
+        yield result
 
 
 def update_file_with_preamble(file_path: Path, source: str):
     """Update a text file to include the source preamble"""
-    # Read current content
-    with open(file_path, 'r', encoding='utf-8') as f:
-        original_text = f.read().rstrip()
+    header = f"source: {source}\n---\n".encode('utf-8')
 
-    # Write new content with preamble
-    new_content = f"source: {source}\n---\n{original_text}"
+    # Work in bytes throughout to skip a decode/encode round trip of the body
+    with open(file_path, 'rb') as f:
+        body = f.read().rstrip()
 
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
+    # Write to a temp file and swap it in, so Ctrl+C never leaves a half-written text
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, file_path)
 
 
 def main():
@@ -90,7 +285,7 @@ def main():
         '--delay',
         type=float,
         default=3.0,
-        help='Delay between requests in seconds (default: 3.0)'
+        help='Delay between requests in seconds (default: 3.0; 0 fetches several texts concurrently)'
     )
 
     args = parser.parse_args()
@@ -102,11 +297,22 @@ def main():
 
     # Find all text files without preambles
     print(f"Scanning {args.directory}/ for texts without preambles...")
+    candidates = sorted(texts_dir.glob('*.txt'))
+    known = load_index(texts_dir)
+    index = {}
     files_without_preamble = []
 
-    for file_path in sorted(texts_dir.glob('*.txt')):
-        if not has_preamble(file_path):
-            files_without_preamble.append(file_path)
+    # Checking is just many small stats/reads, so overlap them in a thread pool.
+    # Files whose mtime matches the index from a previous run are never opened.
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        results = pool.map(lambda file_path: check_file(file_path, known), candidates)
+        for file_path, (has, mtime_ns) in zip(candidates, results):
+            if has:
+                index[file_path.stem] = mtime_ns
+            else:
+                files_without_preamble.append(file_path)
+
+    save_index(texts_dir, index)
 
     print(f"Found {len(files_without_preamble)} texts without preambles")
 
@@ -116,33 +322,65 @@ def main():
 
     # Process up to the requested count
     to_process = files_without_preamble[:args.count]
-    print(f"Processing {len(to_process)} texts with {args.delay}s delay between requests\n")
+    total = len(to_process)
+    # Text IDs are the filenames (e.g., '3551496.txt' -> '3551496')
+    text_ids = [file_path.stem for file_path in to_process]
+
+    # With no politeness delay, overlap requests over several connections
+    fetcher = None
+    if args.delay == 0:
+        print(f"Processing {total} texts with up to {CONCURRENT_REQUESTS} concurrent requests\n")
+        fetcher = ThreadPoolExecutor(max_workers=CONCURRENT_REQUESTS)
+        results = fetch_sources_concurrently(fetcher, text_ids, CONCURRENT_REQUESTS)
+    else:
+        print(f"Processing {total} texts with {args.delay}s delay between requests\n")
+        # Every request after the first observes the delay between send and read
+        results = (
+            fetch_source_from_url(text_id, args.delay if i > 0 else 0.0)
+            for i, text_id in enumerate(text_ids)
+        )
 
     successful = 0
     failed = 0
 
+    # File writes run on a single background worker so they overlap with the
+    # politeness delay instead of adding to it. Requests stay serial unless --delay is 0.
+    writer = ThreadPoolExecutor(max_workers=1)
+    pending_write: Future | None = None
+
     try:
-        for i, file_path in enumerate(to_process, 1):
-            text_id = get_text_id_from_filename(file_path)
-            print(f"[{i}/{len(to_process)}] Processing {file_path.name} (ID: {text_id})...", end=' ')
+        for i, (file_path, text_id) in enumerate(zip(to_process, text_ids), 1):
+            # The previous write has had the whole delay to finish; surface any error
+            if pending_write is not None:
+                pending_write.result()
+                pending_write = None
+
+            # One write + flush per phase keeps terminal I/O out of the loop's way
+            sys.stdout.write(f"[{i}/{total}] Processing {file_path.name} (ID: {text_id})... ")
+            sys.stdout.flush()
 
-            source, request_time = fetch_source_from_url(text_id)
+            source, request_time, slow_response = next(results)
 
             if source:
-                update_file_with_preamble(file_path, source)
-                print(f"✓ Added source ({request_time:.2f}s): {source}")
+                pending_write = writer.submit(update_file_with_preamble, file_path, source)
+                status = f"✓ Added source ({request_time:.2f}s): {source}\n"
                 successful += 1
             else:
-                print(f"✗ Could not find source ({request_time:.2f}s)")
+                status = f"✗ Could not find source ({request_time:.2f}s)\n"
                 failed += 1
 
+            if slow_response:
+                status += "  ⚠️  Slow response detected, sleeping 30s to let server recover...\n"
+            sys.stdout.write(status)
+            sys.stdout.flush()
+
             # If request took more than 10 seconds, sleep for 30 seconds to let server recover
-            if request_time > 10.0:
-                print(f"  ⚠️  Slow response detected, sleeping 30s to let server recover...")
+            # (the regular delay happens inside the next fetch)
+            if slow_response:
                 time.sleep(30)
-            # Sleep between requests (except after the last one)
-            elif i < len(to_process):
-                time.sleep(args.delay)
+
+        if pending_write is not None:
+            pending_write.result()
 
         print(f"\nComplete! Successful: {successful}, Failed: {failed}")
         return 0
@@ -157,6 +395,11 @@ def main():
         print(f"Successful: {successful}, Failed: {failed}")
         print(f"You can restart and it will skip already processed files.")
         raise
+    finally:
+        # Let an in-flight write finish so no file is left half-written
+        writer.shutdown(wait=True)
+        if fetcher is not None:
+            fetcher.shutdown(wait=True, cancel_futures=True)
 
 
 if __name__ == "__main__":
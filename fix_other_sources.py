@@ -4,52 +4,138 @@ Fix "a other" sources by using LLM to suggest better phrasing
 """
 
 import argparse
+import atexit
+import hashlib
 import json
+import os
+import shutil
 import subprocess
 import sys
-import time
 import tty
 import termios
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
 PROGRESS_FILE = ".fix_progress.json"
+PROGRESS_LOG = ".fix_progress.log"  # Append-only, compacted into PROGRESS_FILE
+LLM_CACHE_FILE = ".llm_cache.json"
+LLM_BATCH_SIZE = 20  # Sources rewritten per `llm` call
+SCAN_WORKERS = 16  # Threads used to read text headers concurrently
+
+# Terminal settings from before enter_key_mode(), or None if never switched
+_cooked_tty_settings = None
 
 
 def load_progress():
-    """Load progress from JSON file"""
+    """Load progress from the compacted JSON file plus any entries in the log"""
+    progress = {"processed": []}
     if Path(PROGRESS_FILE).exists():
         with open(PROGRESS_FILE, 'r') as f:
-            return json.load(f)
-    return {"processed": []}
+            progress = json.load(f)
+
+    # Entries appended since the last compaction (e.g. after a crash)
+    if Path(PROGRESS_LOG).exists():
+        seen = set(progress["processed"])
+        with open(PROGRESS_LOG, 'r') as f:
+            for line in f:
+                source_line = line.rstrip('\n')
+                if source_line and source_line not in seen:
+                    progress["processed"].append(source_line)
+                    seen.add(source_line)
+
+    return progress
+
+
+def append_progress(progress, source_line):
+    """Mark a source as processed by appending one line to the progress log"""
+    progress["processed"].append(source_line)
+    with open(PROGRESS_LOG, 'a') as f:
+        f.write(source_line + '\n')
 
 
 def save_progress(progress):
-    """Save progress to JSON file"""
-    with open(PROGRESS_FILE, 'w') as f:
+    """Compact progress into the JSON file and drop the log"""
+    tmp_path = PROGRESS_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
         json.dump(progress, f, indent=2)
+    os.replace(tmp_path, PROGRESS_FILE)
+
+    if Path(PROGRESS_LOG).exists():
+        os.remove(PROGRESS_LOG)
+
+
+def load_llm_cache():
+    """Load cached LLM suggestions ({sha256 of source: suggestion})"""
+    if Path(LLM_CACHE_FILE).exists():
+        with open(LLM_CACHE_FILE, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                # Only a cache - a damaged one just means asking the LLM again
+                print(f"⚠️  {LLM_CACHE_FILE} is damaged, starting with an empty LLM cache")
+    return {}
+
+
+def save_llm_cache(cache):
+    """Save cached LLM suggestions atomically so an interrupted run can't corrupt them"""
+    tmp_path = LLM_CACHE_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, LLM_CACHE_FILE)
+
+
+def llm_cache_key(source_text):
+    """Key a source in the LLM cache by its content hash"""
+    return hashlib.sha256(source_text.encode('utf-8')).hexdigest()
+
+
+def strip_source_prefix(source_line):
+    """Extract the attribution text from a "source: ..." line"""
+    if source_line.startswith("source: "):
+        return source_line[8:]  # Remove "source: " prefix
+    return source_line
+
+
+def enter_key_mode():
+    """
+    Switch the terminal to cbreak mode once for the whole run, so reading a key
+    needs no termios calls. The original settings are restored at exit.
+    """
+    global _cooked_tty_settings
+    fd = sys.stdin.fileno()
+    _cooked_tty_settings = termios.tcgetattr(fd)
+    tty.setcbreak(fd)
+    atexit.register(termios.tcsetattr, fd, termios.TCSADRAIN, _cooked_tty_settings)
 
 
 def get_single_key():
     """Get a single keypress from the user without requiring Enter"""
+    # Read whatever is pending in one syscall; extra bytes from key repeat or a
+    # paste burst are dropped so they can't answer the next prompt
+    data = os.read(sys.stdin.fileno(), 16)
+    ch = data.decode('utf-8', errors='replace')[:1]
+    # Check for Ctrl+C (ASCII 3) or EOF
+    if not ch or ord(ch) == 3:
+        raise KeyboardInterrupt
+    return ch
+
+
+def input_line(prompt):
+    """Read a full line with normal echo and line editing"""
+    if _cooked_tty_settings is None:
+        return input(prompt)
+
     fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
+    key_mode_settings = termios.tcgetattr(fd)
+    termios.tcsetattr(fd, termios.TCSADRAIN, _cooked_tty_settings)
     try:
-        tty.setraw(sys.stdin.fileno())
-        ch = sys.stdin.read(1)
-        # Check for Ctrl+C (ASCII 3)
-        if ord(ch) == 3:
-            raise KeyboardInterrupt
+        return input(prompt)
     finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return ch
+        termios.tcsetattr(fd, termios.TCSADRAIN, key_mode_settings)
 
 
-def get_llm_suggestion(source_text):
-    """Get LLM suggestion for rewriting the source"""
-    prompt = f"""Rewrite this source to avoid using "a other". Examples:
-
-From: All in the Family, a other by Norman Lear
+REWRITE_EXAMPLES = """From: All in the Family, a other by Norman Lear
 To: All in the Family, a TV show by Norman Lear
 
 From: Hop Quote, a other by Submitted by Kendrick Lamar - www.brainyquote.com
@@ -59,21 +145,20 @@ From: Letter Birmingham Jail, a other by Martin Luther King Jr.
 To: A Letter from Birmingham Jail, an essay by Martin Luther King Jr.
 
 From: Short Joke, a other by boredpanda.com
-To: a quote from boredpanda.com
-
-Now rewrite: {source_text}
+To: a quote from boredpanda.com"""
 
-Respond with ONLY the rewritten source, nothing else."""
 
+def run_llm(prompt, timeout):
+    """Run `llm` on a prompt and return its output, or None if it failed"""
     try:
         result = subprocess.run(
             ['llm'],
             input=prompt,
             capture_output=True,
             text=True,
-            timeout=30
+            timeout=timeout
         )
-        return result.stdout.strip()
+        return result.stdout
     except subprocess.TimeoutExpired:
         print("  ⚠️  LLM timeout, skipping...")
         return None
@@ -82,63 +167,168 @@ Respond with ONLY the rewritten source, nothing else."""
         return None
 
 
-def find_files_with_source(source_line, texts_dir):
-    """Find all text files containing this source line"""
+def get_llm_suggestions(sources):
+    """
+    Get LLM suggestions for rewriting several sources with a single `llm` call.
+    Returns a list in the same order as sources, with None for any source the
+    LLM didn't answer (or for all of them if the response can't be used).
+    """
+    prompt = f"""Rewrite each of these sources to avoid using "a other". Examples:
+
+{REWRITE_EXAMPLES}
+
+Now rewrite these (JSON list): {json.dumps(sources, ensure_ascii=False)}
+
+Respond with ONLY a JSON list of the rewritten sources, in the same order and with exactly one entry per source, nothing else."""
+
+    output = run_llm(prompt, 30 + 10 * len(sources))
+    if output is None:
+        return [None] * len(sources)
+
+    # Tolerate code fences or chatter around the JSON list
     try:
-        # Use grep to find files containing the exact source line
-        # Need to use shell=True to properly expand the glob
-        grep_pattern = f"{texts_dir}/*.txt"
-        result = subprocess.run(
-            f"grep -l -F {subprocess.list2cmdline([source_line])} {grep_pattern}",
-            capture_output=True,
-            text=True,
-            shell=True
-        )
-        if result.returncode == 0:
-            return [Path(f.strip()) for f in result.stdout.split('\n') if f.strip()]
-        return []
+        suggestions = json.loads(output[output.index('['):output.rindex(']') + 1])
+    except ValueError:
+        print("  ⚠️  Could not parse LLM batch response")
+        return [None] * len(sources)
+
+    # Answers are matched to sources by position, so a list of the wrong length can't be trusted
+    if not isinstance(suggestions, list) or len(suggestions) != len(sources):
+        print("  ⚠️  LLM batch response doesn't have one answer per source")
+        return [None] * len(sources)
+
+    return [
+        suggestion.strip() if isinstance(suggestion, str) and suggestion.strip() else None
+        for suggestion in suggestions
+    ]
+
+
+def get_single_llm_suggestion(source_text):
+    """Get the LLM suggestion for one source with its own `llm` call, or None if it failed"""
+    prompt = f"""Rewrite this source to avoid using "a other". Examples:
+
+{REWRITE_EXAMPLES}
+
+Now rewrite: {source_text}
+
+Respond with ONLY the rewritten source, nothing else."""
+
+    output = run_llm(prompt, 30)
+    if output is None:
+        return None
+    return output.strip() or None
+
+
+def get_llm_suggestion(source_text, upcoming, cache):
+    """
+    Get the LLM suggestion for one source, answering from the cache if possible.
+    On a cache miss, the next uncached sources from `upcoming` ride along in the
+    same batch so later lookups are cache hits. If the batch leaves this source
+    unanswered, it is retried on its own. Returns None if there is no suggestion.
+    """
+    key = llm_cache_key(source_text)
+    if key not in cache:
+        batch = [source_text]
+        for other in upcoming:
+            if len(batch) >= LLM_BATCH_SIZE:
+                break
+            if other not in batch and llm_cache_key(other) not in cache:
+                batch.append(other)
+
+        for source, suggestion in zip(batch, get_llm_suggestions(batch)):
+            if suggestion is not None:
+                cache[llm_cache_key(source)] = suggestion
+
+        if key not in cache:
+            suggestion = get_single_llm_suggestion(source_text)
+            if suggestion is not None:
+                cache[key] = suggestion
+
+        save_llm_cache(cache)
+
+    return cache.get(key)
+
+
+def read_source_line(file_path):
+    """Read the "source: ..." first line of a text file, or None if it has none"""
+    try:
+        with open(file_path, 'rb') as f:
+            first_line = f.readline()
     except Exception as e:
-        print(f"  ⚠️  Error finding files: {e}")
-        return []
+        print(f"  ⚠️  Error reading {file_path}: {e}")
+        return None
+
+    if not first_line.startswith(b'source: '):
+        return None
+    return first_line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+
+def build_source_index(texts_dir):
+    """Map each "source: ..." line to the text files that start with it"""
+    files = sorted(texts_dir.glob('*.txt'))
+    index = {}
+
+    # One pass over every header, overlapped in a thread pool
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        for file_path, source_line in zip(files, pool.map(read_source_line, files)):
+            if source_line is not None:
+                index.setdefault(source_line, []).append(file_path)
+
+    return index
 
 
 def replace_in_file(file_path, old_line, new_line):
     """Replace old source line with new source line in a file"""
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        with open(file_path, 'rb') as src:
+            first_line = src.readline()
 
-        # Replace the exact line
-        new_content = content.replace(old_line, new_line)
+            # The source line is always the header, so only that line is compared
+            line_ending = first_line[len(first_line.rstrip(b'\r\n')):]
+            if first_line[:len(first_line) - len(line_ending)] != old_line.encode('utf-8'):
+                return False
 
-        if new_content != content:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            return True
-        return False
+            # Stream the body across unchanged behind the new header
+            with open(tmp_path, 'wb') as dst:
+                dst.write(new_line.encode('utf-8') + line_ending)
+                shutil.copyfileobj(src, dst, length=1 << 20)
+
+        os.replace(tmp_path, file_path)
+        return True
     except Exception as e:
         print(f"  ⚠️  Error updating {file_path}: {e}")
+        tmp_path.unlink(missing_ok=True)
         return False
 
 
-def replace_source_in_files(old_source, new_source, texts_dir):
+def replace_source_in_files(old_source, new_source, source_index):
     """Replace source in all matching files"""
     old_line = f"source: {old_source}"
     new_line = f"source: {new_source}"
 
-    files = find_files_with_source(old_line, texts_dir)
+    files = source_index.pop(old_line, [])
 
     if not files:
         print(f"  ⚠️  No files found with this source")
         return 0
 
-    updated = 0
+    updated = []
+    unchanged = []
     for file_path in files:
         if replace_in_file(file_path, old_line, new_line):
-            updated += 1
+            updated.append(file_path)
+        else:
+            unchanged.append(file_path)
 
-    print(f"  ✓ Updated {updated} file(s)")
-    return updated
+    # Keep the index in step with what is now on disk
+    if unchanged:
+        source_index[old_line] = unchanged
+    if updated:
+        source_index.setdefault(new_line, []).extend(updated)
+
+    print(f"  ✓ Updated {len(updated)} file(s)")
+    return len(updated)
 
 
 def main():
@@ -192,25 +382,29 @@ def main():
         print("All sources already processed!")
         return 0
 
+    print(f"Indexing sources in {texts_dir}/...\n")
+    source_index = build_source_index(texts_dir)
+    llm_cache = load_llm_cache()
+
+    # Confirmations read single keys; set the terminal up for that once
+    if not args.yolo:
+        enter_key_mode()
+
     try:
         for i, source_line in enumerate(remaining, 1):
             # Source line already has "source: " prefix from the file
-            # Extract just the attribution text
-            if source_line.startswith("source: "):
-                source_text = source_line[8:]  # Remove "source: " prefix
-            else:
-                source_text = source_line
+            source_text = strip_source_prefix(source_line)
 
             print(f"[{i}/{len(remaining)}] Processing:")
             print(f"  Original: {source_text}")
 
-            # Get LLM suggestion
-            suggestion = get_llm_suggestion(source_text)
+            # Get LLM suggestion (batched with the next few sources)
+            upcoming = (strip_source_prefix(line) for line in remaining[i:])
+            suggestion = get_llm_suggestion(source_text, upcoming, llm_cache)
 
             if suggestion is None:
-                # Skip if LLM failed
-                progress["processed"].append(source_line)
-                save_progress(progress)
+                # Leave it unprocessed so the next run asks the LLM again
+                print("  ⚠️  No suggestion, leaving this source for the next run\n")
                 continue
 
             print(f"  Suggested: {suggestion}")
@@ -218,7 +412,7 @@ def main():
             # Auto-accept in yolo mode
             if args.yolo:
                 print("  [YOLO mode: auto-accepting]")
-                replace_source_in_files(source_text, suggestion, texts_dir)
+                replace_source_in_files(source_text, suggestion, source_index)
             else:
                 # Ask user
                 while True:
@@ -239,13 +433,13 @@ def main():
 
                     if response == 'y':
                         # Accept suggestion
-                        replace_source_in_files(source_text, suggestion, texts_dir)
+                        replace_source_in_files(source_text, suggestion, source_index)
                         break
                     elif response == 'n':
                         # Ask for manual input (needs full line)
-                        manual = input("  Enter replacement: ").strip()
+                        manual = input_line("  Enter replacement: ").strip()
                         if manual:
-                            replace_source_in_files(source_text, manual, texts_dir)
+                            replace_source_in_files(source_text, manual, source_index)
                         break
                     elif response == 's':
                         # Skip
@@ -253,20 +447,17 @@ def main():
                         break
 
             # Mark as processed
-            progress["processed"].append(source_line)
-            save_progress(progress)
+            append_progress(progress, source_line)
             print()
 
-            # Sleep in yolo mode to avoid hammering the LLM
-            if args.yolo:
-                time.sleep(0.25)
-
     except KeyboardInterrupt:
+        save_progress(progress)
         print("\n\nInterrupted! Progress saved.")
         print(f"Processed {len(progress['processed'])} total sources.")
         print("Run again to continue from where you left off.")
         return 1
 
+    save_progress(progress)
     print(f"\nComplete! Processed {len(progress['processed'])} sources.")
     return 0
 
@@ -4,21 +4,47 @@ just-type-it: A CLI typing tutor with a slick TUI interface
 """
 
 import argparse
+import atexit
 import curses
 import logging
+import logging.handlers
+import os
+import queue
 import random
 import sys
 import time
-from dataclasses import dataclass
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from itertools import repeat
+from operator import itemgetter
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 
-# Set up debug logging
-logging.basicConfig(
-    filename='/tmp/just_type_it.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(message)s'
-)
+DEBUG_LOG_FILE = '/tmp/just_type_it.log'
+DEBUG_ENV_OFF_VALUES = ('', '0', 'false', 'no', 'off')
+
+# Whether debug logging is on (set by setup_logging); guards message building in the keystroke loop
+_DBG = False
+
+# Newlines are displayed as a visible symbol
+NEWLINE_TABLE = str.maketrans({'\n': '↵'})
+
+# Most queued keys applied before redrawing, so a long paste still shows progress
+MAX_KEY_BATCH = 64
+
+# Key codes from getch(), checked on every keystroke
+BACKSPACE_KEYS = frozenset((curses.KEY_BACKSPACE, 127, 8))
+ENTER_KEYS = frozenset((10, 13, curses.KEY_ENTER))
+SPACE_KEY = 32
+
+# Seconds the live stats line is reused before it is recomputed
+LIVE_STATS_INTERVAL = 0.1
+
+# Lessons kept for "back"; the oldest is dropped once a session goes deeper than this
+MAX_LESSON_HISTORY = 64
 
 
 @dataclass
@@ -26,6 +52,18 @@ class Lesson:
     """Represents a typing lesson with optional source attribution"""
     text: str
     source: Optional[str] = None
+    length: int = field(init=False, repr=False, compare=False)  # len(text), fixed for the lesson's lifetime
+
+    def __post_init__(self):
+        self.length = len(self.text)
+        # Lessons from the same library file share one copy of the source string
+        if self.source:
+            self.source = sys.intern(self.source)
+
+    @cached_property
+    def word_bounds(self) -> 'WordBounds':
+        """Word boundaries of the text, built once and kept while the lesson is on the stack"""
+        return WordBounds(self.text)
 
 
 class DisplayLayout:
@@ -79,99 +117,121 @@ class TextWrapper:
         self.text = text
         self.width = width
         self.wrapped_lines: list[str] = []
-        self.index_to_pos: dict[int, tuple[int, int]] = {}  # original_index -> (row, col)
+        # Wrapped (row, col) of each original index, kept as two parallel arrays
+        length = len(text)
+        self.rows = array('i', [0]) * length
+        self.cols = array('i', [0]) * length
+        # run_ends[i] is one past the last index drawn side by side after index i
+        self.run_ends = array('i', [length]) * length
+
+        # Run of side-by-side characters being collected while wrapping
+        self._run_start = 0
+        self._run_end = 0
+        self._run_row = 0
+        self._run_col = 0
 
         self._wrap_text()
+        self._end_run()
 
     def _wrap_text(self):
         """Wrap text at word boundaries and build position mapping"""
-        current_line = ""
+        width = self.width
         current_row = 0
-        current_col = 0
-        original_idx = 0
+        para_start = 0   # Original index of the current paragraph's first character
+        line_start = 0   # Paragraph offset where the current line's text begins
+        line_len = 0     # Length of the current line, which is also the next free column
 
         # Split by newlines first to preserve paragraph structure
         paragraphs = self.text.split('\n')
 
         for para_idx, paragraph in enumerate(paragraphs):
             if para_idx > 0:
-                # Record the newline character position
-                self.index_to_pos[original_idx] = (current_row, current_col)
-                original_idx += 1
-
-                # Move to next line for the newline
-                if current_line:
-                    self.wrapped_lines.append(current_line)
-                    current_row += 1
-                    current_line = ""
-                    current_col = 0
-                else:
-                    # Empty line (consecutive newlines)
-                    self.wrapped_lines.append("")
-                    current_row += 1
-                    current_col = 0
-
-            # Process words in the paragraph
-            words = paragraph.split(' ')
-            for word_idx, word in enumerate(words):
+                # Record the newline character position, then move to the next line.
+                # A line is emitted even when empty (consecutive newlines)
+                previous = paragraphs[para_idx - 1]
+                self._place(para_start - 1, 1, current_row, line_len)
+                self.wrapped_lines.append(previous[line_start:line_start + line_len])
+                current_row += 1
+                line_len = 0
+
+            # Process words in the paragraph; offset tracks where each word starts
+            offset = 0
+            for word_idx, word in enumerate(paragraph.split(' ')):
                 if word_idx > 0:
                     # Record the space position
-                    self.index_to_pos[original_idx] = (current_row, current_col)
-                    original_idx += 1
+                    self._place(para_start + offset - 1, 1, current_row, line_len)
 
                 # Check if word fits on current line
                 word_len = len(word)
-                space_needed = word_len if not current_line else len(current_line) + 1 + word_len
+                space_needed = word_len if not line_len else line_len + 1 + word_len
 
-                if space_needed <= self.width:
+                if space_needed <= width:
                     # Word fits on current line
-                    if current_line:
-                        current_line += ' '
-                        current_col += 1
-
-                    # Add each character of the word with its position
-                    for char in word:
-                        self.index_to_pos[original_idx] = (current_row, current_col)
-                        current_line += char
-                        current_col += 1
-                        original_idx += 1
+                    if line_len:
+                        line_len += 1  # The space joins the line
+                    else:
+                        line_start = offset
+                    self._place(para_start + offset, word_len, current_row, line_len)
+                    line_len += word_len
                 else:
                     # Word doesn't fit - need to wrap
-                    if current_line:
+                    if line_len:
                         # Finish current line and start new one
-                        self.wrapped_lines.append(current_line)
+                        self.wrapped_lines.append(paragraph[line_start:line_start + line_len])
                         current_row += 1
-                        current_line = ""
-                        current_col = 0
-
-                    # Handle very long words that exceed line width
-                    if word_len > self.width:
-                        # Hard break the word
-                        for char in word:
-                            if current_col >= self.width:
-                                self.wrapped_lines.append(current_line)
+                        line_len = 0
+                    line_start = offset
+
+                    if word_len > width:
+                        # Hard break the word into width-sized pieces
+                        # (a single character per line when width < 1)
+                        done = 0
+                        while done < word_len:
+                            if line_len >= width:
+                                self.wrapped_lines.append(paragraph[line_start:line_start + line_len])
                                 current_row += 1
-                                current_line = ""
-                                current_col = 0
-
-                            self.index_to_pos[original_idx] = (current_row, current_col)
-                            current_line += char
-                            current_col += 1
-                            original_idx += 1
+                                line_len = 0
+                                line_start = offset + done
+                            piece = max(1, min(word_len - done, width - line_len))
+                            self._place(para_start + offset + done, piece, current_row, line_len)
+                            line_len += piece
+                            done += piece
                     else:
                         # Word fits on a new line
-                        for char in word:
-                            self.index_to_pos[original_idx] = (current_row, current_col)
-                            current_line += char
-                            current_col += 1
-                            original_idx += 1
+                        self._place(para_start + offset, word_len, current_row, 0)
+                        line_len = word_len
+
+                offset += word_len + 1
 
-            # After processing all words in paragraph, if there's remaining text, save it
+            # After processing all words in paragraph, if there's remaining text, keep it
             # (but don't add a new line yet - wait for the next paragraph's newline)
+            para_start += len(paragraph) + 1
 
         # Add any remaining text
-        if current_line:
-            self.wrapped_lines.append(current_line)
+        if line_len:
+            self.wrapped_lines.append(paragraphs[-1][line_start:line_start + line_len])
+
+    def _place(self, index: int, count: int, row: int, col: int):
+        """Put count characters starting at an original index side by side at (row, col)"""
+        # Characters are placed in index order, so they either continue the current run
+        # on the same line or start a new one
+        if not count:
+            return
+        if row != self._run_row or col != self._run_col + (index - self._run_start):
+            self._end_run()
+            self._run_start = index
+            self._run_row = row
+            self._run_col = col
+        self._run_end = index + count
+
+    def _end_run(self):
+        """Write the collected run into the position arrays with one slice assignment each"""
+        start, end = self._run_start, self._run_end
+        count = end - start
+        if count:
+            self.rows[start:end] = array('i', [self._run_row]) * count
+            self.cols[start:end] = array('i', range(self._run_col, self._run_col + count))
+            self.run_ends[start:end] = array('i', [end]) * count
 
     def get_position(self, original_index: int) -> tuple[int, int]:
         """
@@ -180,7 +240,9 @@ class TextWrapper:
         Returns:
             (row, col) tuple for rendering position
         """
-        return self.index_to_pos.get(original_index, (0, 0))
+        if 0 <= original_index < len(self.rows):
+            return self.rows[original_index], self.cols[original_index]
+        return (0, 0)
 
     def get_line_count(self) -> int:
         """Get total number of wrapped lines"""
@@ -190,15 +252,22 @@ class TextWrapper:
 class TypingStats:
     """Track typing statistics like WPM and accuracy"""
 
+    # Updated on every keystroke; fixed slots make those attribute reads and writes cheaper
+    __slots__ = ('start_time', 'correct_keystrokes', 'total_keystrokes', 'mistyped_words',
+                 '_mistyped_dirty', '_top_cache', '_top_cache_n')
+
     def __init__(self):
         self.start_time: Optional[float] = None
         self.correct_keystrokes = 0
         self.total_keystrokes = 0
-        self.mistyped_words: dict[str, int] = {}  # word -> error count
+        self.mistyped_words: Counter[str] = Counter()  # word -> error count
+        self._mistyped_dirty = True  # Set whenever mistyped_words changes
+        self._top_cache: list[tuple[str, int]] = []
+        self._top_cache_n = 0
 
     def start(self):
         """Start the timer"""
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
 
     def record_keystroke(self, correct: bool):
         """Record a keystroke"""
@@ -210,7 +279,7 @@ class TypingStats:
         """Get elapsed time in seconds"""
         if self.start_time is None:
             return 0.0
-        return time.time() - self.start_time
+        return time.monotonic() - self.start_time
 
     def get_wpm(self, chars_typed: int) -> float:
         """Calculate words per minute (1 word = 5 characters)"""
@@ -227,17 +296,25 @@ class TypingStats:
             return 100.0
         return (self.correct_keystrokes / self.total_keystrokes) * 100
 
+    def sample(self, chars_typed: int) -> tuple[float, float, float]:
+        """Get (elapsed, wpm, accuracy) for the live stats line from a single clock reading"""
+        elapsed = self.get_elapsed_time()
+        wpm = (chars_typed / 5) / (elapsed / 60) if elapsed > 0 else 0.0
+        return elapsed, wpm, self.get_accuracy()
+
     def record_mistyped_word(self, word: str):
         """Record a word that was mistyped"""
-        if word in self.mistyped_words:
-            self.mistyped_words[word] += 1
-        else:
-            self.mistyped_words[word] = 1
+        self.mistyped_words[word] += 1
+        self._mistyped_dirty = True
 
     def get_top_mistyped_words(self, n: int = 10) -> list[tuple[str, int]]:
         """Get top N most mistyped words, sorted by error count descending"""
-        sorted_words = sorted(self.mistyped_words.items(), key=lambda x: x[1], reverse=True)
-        return sorted_words[:n]
+        # Reuse the last result until a new mistyped word is recorded
+        if self._mistyped_dirty or n > self._top_cache_n:
+            self._top_cache = self.mistyped_words.most_common(n)
+            self._top_cache_n = n
+            self._mistyped_dirty = False
+        return self._top_cache[:n]
 
 
 def parse_preamble(text: str) -> tuple[str, Optional[str]]:
@@ -252,20 +329,24 @@ def parse_preamble(text: str) -> tuple[str, Optional[str]]:
     Returns:
         (text_to_type, source) where source is None if no preamble found
     """
-    lines = text.split('\n', 2)  # Split into at most 3 parts
+    # Probe the first two lines with find rather than splitting a large file
+    if text.startswith('source:'):
+        first_end = text.find('\n')
+        second_end = text.find('\n', first_end + 1) if first_end >= 0 else -1
 
-    # Check if we have a preamble format: "source: ..." followed by "---"
-    if len(lines) >= 3 and lines[0].startswith('source:') and lines[1].strip() == '---':
-        source = lines[0][7:].strip()  # Remove "source:" prefix
-        actual_text = lines[2]  # Everything after the ---
-        return (actual_text, source)
+        # Check if we have a preamble format: "source: ..." followed by "---"
+        if second_end >= 0 and text[first_end + 1:second_end].strip() == '---':
+            source = text[7:first_end].strip()  # Remove "source:" prefix
+            actual_text = text[second_end + 1:]  # Everything after the ---
+            return (actual_text, source)
 
     # No preamble found
     return (text, None)
 
 
-def get_random_file_from_library(library_path: str) -> str:
-    """Get a random file from a library directory"""
+@lru_cache(maxsize=1)
+def list_library_files(library_path: str) -> tuple[str, ...]:
+    """List the files in a library directory, scanned once per session"""
     library = Path(library_path)
 
     if not library.exists():
@@ -274,15 +355,32 @@ def get_random_file_from_library(library_path: str) -> str:
     if not library.is_dir():
         raise NotADirectoryError(f"Library path is not a directory: {library_path}")
 
-    # Get all files in the directory (not subdirectories)
-    files = [f for f in library.iterdir() if f.is_file()]
+    # Files only (not subdirectories), using the file type scandir already read instead of a stat per entry
+    with os.scandir(library) as entries:
+        files = tuple(entry.path for entry in entries if entry.is_file())
 
     if not files:
         raise ValueError(f"No files found in library directory: {library_path}")
 
-    # Pick a random file
-    random_file = random.choice(files)
-    return str(random_file)
+    return files
+
+
+def get_random_file_from_library(library_path: str) -> str:
+    """Get a random file from a library directory"""
+    return random.choice(list_library_files(library_path))
+
+
+def read_text_file(path: str) -> str:
+    """Read a UTF-8 text file in one binary read, with Windows and old Mac line endings normalized"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    # Match text mode's universal newlines; a CR byte never occurs inside a UTF-8 sequence
+    if b'\r' in data:
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+    # Remove trailing whitespace but preserve internal formatting
+    return data.decode('utf-8').rstrip()
 
 
 def load_text(text_file: Optional[str], text_input: Optional[str], library_path: Optional[str]) -> Lesson:
@@ -296,12 +394,16 @@ def load_text(text_file: Optional[str], text_input: Optional[str], library_path:
     elif library_path:
         # Pick a random file from the library
         random_file = get_random_file_from_library(library_path)
-        logging.info(f"Selected random file from library: {random_file}")
-        with open(random_file, 'r') as f:
-            raw_text = f.read().rstrip()
+        logging.info("Selected random file from library: %s", random_file)
+        try:
+            raw_text = read_text_file(random_file)
+        except FileNotFoundError:
+            # The library changed since it was listed; list it again and pick another file
+            list_library_files.cache_clear()
+            random_file = get_random_file_from_library(library_path)
+            raw_text = read_text_file(random_file)
     elif text_file:
-        with open(text_file, 'r') as f:
-            raw_text = f.read().rstrip()  # Remove trailing whitespace but preserve internal formatting
+        raw_text = read_text_file(text_file)
     else:
         # Default text if nothing provided
         raw_text = "The quick brown fox jumps over the lazy dog"
@@ -317,6 +419,10 @@ def generate_lesson(text: str, repeats: int, shuffle: bool) -> str:
     has_newlines = '\n' in text
 
     if has_newlines:
+        if not shuffle:
+            # Lines keep their order, so the lesson is just the text repeated (at least once)
+            return '\n'.join(repeat(text, max(repeats, 1)))
+
         # For multi-line text, split by lines and shuffle lines if requested
         lines = text.split('\n')
 
@@ -330,6 +436,13 @@ def generate_lesson(text: str, repeats: int, shuffle: bool) -> str:
 
         return '\n'.join(lines)
     else:
+        if not shuffle:
+            # Words keep their order, so repeat the whitespace-normalized line as a whole
+            line = ' '.join(text.split())
+            if repeats <= 1 or not line:
+                return line
+            return ' '.join(repeat(line, repeats))
+
         # For single-line text, shuffle words as before
         words = text.split()
 
@@ -345,7 +458,7 @@ def generate_lesson(text: str, repeats: int, shuffle: bool) -> str:
         return ' '.join(words)
 
 
-def create_bag_shuffle_lesson(words: list[str], num_bags: int = 3) -> str:
+def create_bag_shuffle_lesson(words: Iterable[str], num_bags: int = 3) -> str:
     """
     Create a lesson using bag shuffle pattern (like modern Tetris).
     Each bag contains all words once, shuffled independently.
@@ -354,6 +467,7 @@ def create_bag_shuffle_lesson(words: list[str], num_bags: int = 3) -> str:
     Result: shuffle(["a","b"]) + shuffle(["a","b"]) + shuffle(["a","b"])
     Possible: "b a a b b a" but NOT "a a a b b b"
     """
+    words = list(words)
     bags = []
     for _ in range(num_bags):
         bag = words.copy()
@@ -362,39 +476,85 @@ def create_bag_shuffle_lesson(words: list[str], num_bags: int = 3) -> str:
     return ' '.join(bags)
 
 
-def draw_lesson_text(stdscr, lesson: str, position: int, error_count: int, start_y: int, layout: DisplayLayout, source: Optional[str] = None):
-    """Draw the lesson text with color coding and optional source"""
-    max_y, max_x = stdscr.getmaxyx()
+@lru_cache(maxsize=8)
+def get_text_wrapper(text: str, width: int) -> TextWrapper:
+    """Wrap text for a width, reusing earlier wraps for repeated lessons and previous terminal sizes"""
+    return TextWrapper(text, width)
 
-    # Create text wrapper for proper word wrapping
-    wrapper = TextWrapper(lesson, layout.content_width)
 
-    # Draw each character with appropriate color
-    for i, char in enumerate(lesson):
-        # Get wrapped position for this character
-        row, col = wrapper.get_position(i)
-        screen_y = start_y + row
-        screen_x = layout.left_margin + col
+def draw_lesson_range(pad, lesson: str, wrapper: TextWrapper, start: int, end: int, attr: int):
+    """Draw lesson[start:end] in one color, with one addstr per run of adjacent cells.
 
-        # Check if we've run out of vertical space
-        if screen_y >= max_y - 4:
-            break
+    lesson is the display copy of the text, with newlines already shown as ↵.
+    """
+    rows, cols, run_ends = wrapper.rows, wrapper.cols, wrapper.run_ends
+    addstr = pad.addstr
+    i = start
+    while i < end:
+        # Draw up to where characters stop sitting side by side on the same wrapped line
+        run_end = run_ends[i]
+        if run_end > end:
+            run_end = end
+
+        addstr(rows[i], cols[i], lesson[i:run_end], attr)
+        i = run_end
+
+
+def draw_lesson_span(pad, lesson: str, wrapper: TextWrapper, start: int, end: int, position: int, error_count: int, colors: tuple[int, int, int]):
+    """Draw lesson[start:end] colored by typing progress, using (typed, error, untyped) attributes"""
+    # The lesson splits into at most three color ranges, each drawn in runs:
+    # typed correctly (green), error buffer (red background), not yet typed (default)
+    typed_attr, error_attr, untyped_attr = colors
+    error_end = min(position + error_count, len(lesson))
+
+    # The pad only holds the lines that fit above the separator (plus a spare row);
+    # wrapped rows never decrease along the text, so everything past them is one tail
+    end = min(end, bisect_left(wrapper.rows, pad.getmaxyx()[0] - 1))
+    color_ranges = (
+        (0, position, typed_attr),
+        (position, error_end, error_attr),
+        (error_end, len(lesson), untyped_attr),
+    )
+    for range_start, range_end, attr in color_ranges:
+        draw_lesson_range(pad, lesson, wrapper, max(start, range_start), min(end, range_end), attr)
 
-        # Display newlines as a visible symbol
-        display_char = char
-        if char == '\n':
-            display_char = '↵'
-
-        # Determine color based on typing progress
-        if i < position:
-            # Already typed correctly - green
-            stdscr.addstr(screen_y, screen_x, display_char, curses.color_pair(1))
-        elif error_count > 0 and position <= i < position + error_count:
-            # Current position through error buffer - red background
-            stdscr.addstr(screen_y, screen_x, display_char, curses.color_pair(2))
-        else:
-            # Not yet typed - default color
-            stdscr.addstr(screen_y, screen_x, display_char)
+
+def redraw_lesson_changes(pad, lesson: str, wrapper: TextWrapper, old_position: int, old_error_count: int, position: int, error_count: int, colors: tuple[int, int, int]):
+    """Recolor only the lesson cells whose color can differ from the last frame"""
+    # Outside this span a cell is green (before both positions) or default
+    # (past both error buffers) in both frames
+    start = min(old_position, position)
+    end = min(max(old_position + old_error_count, position + error_count), len(lesson))
+    if start >= end:
+        return
+
+    # Widen to whole wrapped lines: a few characters (e.g. leading spaces) share
+    # a cell with a neighbour, and redrawing the line in order keeps the right one on top
+    rows = wrapper.rows
+    first_row = rows[start]
+    while start > 0 and rows[start - 1] == first_row:
+        start -= 1
+    last_row = rows[end - 1]
+    while end < len(lesson) and rows[end] == last_row:
+        end += 1
+
+    draw_lesson_span(pad, lesson, wrapper, start, end, position, error_count, colors)
+
+
+def draw_lesson_text(stdscr, lesson: str, wrapper: TextWrapper, position: int, error_count: int, start_y: int, layout: DisplayLayout, colors: tuple[int, int, int], source: Optional[str] = None):
+    """
+    Draw the lesson text with color coding into a new pad, and the optional source below it.
+    Returns the pad; show_lesson_pad puts it on screen.
+    """
+    max_y, max_x = stdscr.getmaxyx()
+
+    # Only the lines above the separator are ever shown, so the pad holds just those:
+    # a pad the size of a long lesson would exceed curses' 32767-row limit.
+    # One spare row and column: a line break can sit just past a full line, and
+    # curses refuses to write the pad's bottom-right cell
+    visible_rows = max(min(wrapper.get_line_count(), max_y - 4 - start_y), 0)
+    pad = curses.newpad(visible_rows + 1, max(wrapper.width, 1) + 1)
+    draw_lesson_span(pad, lesson, wrapper, 0, len(lesson), position, error_count, colors)
 
     # Draw source if present (after the lesson text)
     if source:
@@ -405,39 +565,106 @@ def draw_lesson_text(stdscr, lesson: str, position: int, error_count: int, start
             source_text = f"— {source}"
             stdscr.addstr(source_y, layout.left_margin, source_text, curses.color_pair(4) | curses.A_DIM)
 
+    return pad
 
-def get_current_word(lesson: str, position: int) -> tuple[str, int]:
-    """Get the current word being typed and its start position"""
-    # Find the start of the current word (stop at space or newline)
-    word_start = position
-    while word_start > 0 and lesson[word_start - 1] not in (' ', '\n'):
-        word_start -= 1
 
-    # Find the end of the current word (stop at space or newline)
-    word_end = position
-    while word_end < len(lesson) and lesson[word_end] not in (' ', '\n'):
-        word_end += 1
+def show_lesson_pad(stdscr, pad, start_y: int, layout: DisplayLayout):
+    """Queue the part of the lesson pad that fits above the separator for the next doupdate"""
+    max_y, max_x = stdscr.getmaxyx()
+    pad_height, pad_width = pad.getmaxyx()
+    bottom = min(start_y + pad_height - 1, max_y - 5)
+    if bottom >= start_y:
+        pad.noutrefresh(0, 0, start_y, layout.left_margin, bottom, min(layout.left_margin + pad_width - 1, max_x - 1))
 
-    return lesson[word_start:word_end], word_start
 
+def draw_status_line(stdscr, y: int, x: int, text: str, attr: int):
+    """Replace a status line's contents, clipped so it never wraps"""
+    max_y, max_x = stdscr.getmaxyx()
+    stdscr.move(y, 0)
+    stdscr.clrtoeol()
+    stdscr.addstr(y, x, text[:max_x - x - 1], attr)
 
-def typing_tutor(stdscr, lesson: Lesson):
-    """Main typing tutor interface using curses"""
-    logging.info(f"Starting typing_tutor with lesson: {lesson.text[:50]}...")
 
-    # Check terminal size
-    max_y, max_x = stdscr.getmaxyx()
-    if not DisplayLayout.check_terminal_size(max_x):
-        stdscr.addstr(0, 0, f"Terminal too small! Need at least {DisplayLayout.MIN_TERMINAL_WIDTH} columns.")
-        stdscr.addstr(1, 0, f"Current: {max_x} columns")
-        stdscr.addstr(2, 0, "Press any key to exit...")
-        stdscr.refresh()
-        stdscr.getch()
-        return TypingStats()  # Return empty stats
+def read_key_batch(stdscr) -> list[int]:
+    """Block for one key, then drain any already-queued keys without blocking"""
+    keys = [stdscr.getch()]
+    stdscr.nodelay(True)
+    try:
+        while len(keys) < MAX_KEY_BATCH:
+            key = stdscr.getch()
+            if key == -1:
+                break
+            keys.append(key)
+    finally:
+        stdscr.nodelay(False)
+    return keys
 
-    # Create layout manager
-    layout = DisplayLayout(max_x)
 
+def unread_keys(keys: list[int]):
+    """Push keys back so the following getch() calls return them in their original order"""
+    for key in reversed(keys):
+        curses.ungetch(key)
+
+
+class WordBounds:
+    """Start and end of the word around every lesson position, computed once per lesson"""
+
+    def __init__(self, text: str):
+        self.text = text
+        length = len(text)
+        # Index length is included so a position just past the last character still resolves
+        self.starts = array('i', [0]) * (length + 1)
+        self.ends = array('i', [length]) * (length + 1)
+
+        # Word start: one past the last space or newline before the position
+        start = 0
+        for i, char in enumerate(text):
+            self.starts[i] = start
+            if char in (' ', '\n'):
+                start = i + 1
+        self.starts[length] = start
+
+        # Word end: the first space or newline at or after the position
+        end = length
+        for i in range(length - 1, -1, -1):
+            if text[i] in (' ', '\n'):
+                end = i
+            self.ends[i] = end
+
+    def get_word(self, position: int) -> tuple[str, int]:
+        """Get the word at a position and its start position"""
+        word_start = self.starts[position]
+        return self.text[word_start:self.ends[position]], word_start
+
+
+def setup_logging(debug: bool):
+    """
+    Log warnings and errors to DEBUG_LOG_FILE, and everything when debug is on.
+    Debug records go through a queue so the typing loop never waits on the file.
+    """
+    global _DBG
+    _DBG = debug
+
+    # The file is only created once something is logged
+    file_handler = logging.FileHandler(DEBUG_LOG_FILE, delay=True)
+    if debug:
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        handler = logging.handlers.QueueHandler(log_queue)
+    else:
+        handler = file_handler
+
+    logging.basicConfig(
+        level=logging.DEBUG if debug else logging.WARNING,
+        format='%(asctime)s - %(message)s',
+        handlers=[handler]
+    )
+
+
+def _init_curses(stdscr):
+    """Set up colors and input modes once for the whole curses session"""
     # Initialize colors
     curses.init_pair(1, curses.COLOR_GREEN, curses.COLOR_BLACK)  # Correct
     curses.init_pair(2, curses.COLOR_WHITE, curses.COLOR_RED)    # Error
@@ -456,178 +683,260 @@ def typing_tutor(stdscr, lesson: Lesson):
     curses.noecho()    # Don't echo input
     stdscr.timeout(-1)  # Wait indefinitely for input
 
-    logging.info(f"Set keypad, nodelay(0), cbreak, noecho, timeout(-1)")
+    logging.info("Set keypad, nodelay(0), cbreak, noecho, timeout(-1)")
+
+
+def typing_tutor(stdscr, lesson: Lesson):
+    """Main typing tutor interface using curses"""
+    logging.info("Starting typing_tutor with lesson: %.50s...", lesson.text)
+
+    # Check terminal size
+    max_y, max_x = stdscr.getmaxyx()
+    if not DisplayLayout.check_terminal_size(max_x):
+        stdscr.addstr(0, 0, f"Terminal too small! Need at least {DisplayLayout.MIN_TERMINAL_WIDTH} columns.")
+        stdscr.addstr(1, 0, f"Current: {max_x} columns")
+        stdscr.addstr(2, 0, "Press any key to exit...")
+        stdscr.refresh()
+        stdscr.getch()
+        return TypingStats()  # Return empty stats
+
+    # Create layout manager
+    layout = DisplayLayout(max_x)
+
+    # Lesson text attributes (typed, error, untyped), looked up once rather than per redraw
+    lesson_colors = (curses.color_pair(1), curses.color_pair(2), curses.A_NORMAL)
 
     # Initialize stats
     stats = TypingStats()
     position = 0  # Position in the lesson text
-    typed_chars = ""  # Characters typed for the current word (including errors)
+    typed_chars = bytearray()  # Key codes typed past the last correct one (errors); Enter is stored as \n
     current_word_had_error = False  # Track if current word has any errors
 
+    # Wrap the lesson once; only colors change while typing
+    wrapper = get_text_wrapper(lesson.text, layout.content_width)
+    words = lesson.word_bounds
+    # Display newlines as a visible symbol; same length, so indexes line up with lesson.text
+    display_lesson = lesson.text.translate(NEWLINE_TABLE)
+    # Expected key code per position, so keystrokes are checked without building a str:
+    # a bytes copy for ASCII lessons (the common case), code points otherwise
+    if lesson.text.isascii():
+        lesson_codes = lesson.text.encode('ascii')
+    else:
+        lesson_codes = array('i', map(ord, lesson.text))
+    title = "=== JUST TYPE IT ==="
+
+    # What was drawn last frame, so each frame only touches what changed
+    last_size = None
+    lesson_pad = None
+    last_position = 0
+    last_error_count = 0
+    last_typing_text = None
+    last_stats_text = None
+    last_stats_time = 0.0  # When the live stats were last computed (time.monotonic)
+    cached_stats_text = None
+
     logging.info("Entering main loop")
     while True:
-        stdscr.erase()  # Use erase() instead of clear() to reduce flicker
         max_y, max_x = stdscr.getmaxyx()
-
-        # Draw title
-        title = "=== JUST TYPE IT ==="
-        stdscr.addstr(0, layout.center_x(len(title)), title, curses.A_BOLD)
-
-        # Draw the lesson text
         error_count = len(typed_chars)
-        draw_lesson_text(stdscr, lesson.text, position, error_count, 2, layout, lesson.source)
 
-        # Get current word and what user has typed for it
-        current_word, word_start = get_current_word(lesson.text, position)
+        if (max_y, max_x) != last_size:
+            # First frame or terminal resized - draw everything from scratch
+            if max_x != layout.terminal_width:
+                # Rewrap for the new width
+                layout = DisplayLayout(max_x)
+                wrapper = get_text_wrapper(lesson.text, layout.content_width)
+            stdscr.erase()
+            stdscr.addstr(0, layout.center_x(len(title)), title, curses.A_BOLD)
+            lesson_pad = draw_lesson_text(stdscr, display_lesson, wrapper, position, error_count, 2, layout, lesson_colors, lesson.source)
+            # Draw separator line within content area
+            stdscr.addstr(max_y - 4, layout.left_margin, "─" * layout.content_width)
+            stdscr.addstr(max_y - 1, layout.left_margin, "ESC to quit", curses.A_DIM)
+            last_size = (max_y, max_x)
+            last_typing_text = None
+            last_stats_text = None
+        else:
+            # Recolor only the lesson cells touched by the last keystrokes
+            redraw_lesson_changes(lesson_pad, display_lesson, wrapper, last_position, last_error_count, position, error_count, lesson_colors)
+        last_position = position
+        last_error_count = error_count
+
+        # Get the start of the current word
+        word_start = words.starts[position]
 
         # Calculate how much of the current word we've typed correctly
         chars_typed_in_word = position - word_start
-        correctly_typed = lesson.text[word_start:position]
+        correctly_typed = display_lesson[word_start:position]
 
-        # Combine correctly typed chars with any errors
-        display_text = correctly_typed + typed_chars
+        # Combine correctly typed chars with any errors (a wrong Enter shows as ↵)
+        display_text = correctly_typed + typed_chars.decode('ascii').translate(NEWLINE_TABLE)
 
-        # Replace newlines with visible symbol for display
-        display_text = display_text.replace('\n', '↵')
+        # Draw current word being typed (only when it changed)
+        typing_text = f"Typing: {display_text}"
+        if typing_text != last_typing_text:
+            draw_status_line(stdscr, max_y - 3, layout.left_margin, typing_text, curses.color_pair(3))
+            last_typing_text = typing_text
 
-        # Draw current word being typed
-        status_y = max_y - 4
-        # Draw separator line within content area
-        stdscr.addstr(status_y, layout.left_margin, "─" * layout.content_width)
-        stdscr.addstr(status_y + 1, layout.left_margin, f"Typing: {display_text}", curses.color_pair(3))
-
-        # Draw statistics
+        # Draw statistics, recomputed at most every LIVE_STATS_INTERVAL
         if position > 0:
-            elapsed = stats.get_elapsed_time()
-            wpm = stats.get_wpm(position)
-            accuracy = stats.get_accuracy()
-            stats_text = f"Time: {elapsed:.1f}s | WPM: {wpm:.1f} | Accuracy: {accuracy:.1f}%"
+            now = time.monotonic()
+            if cached_stats_text is None or now - last_stats_time >= LIVE_STATS_INTERVAL:
+                elapsed, wpm, accuracy = stats.sample(position)
+                cached_stats_text = f"Time: {elapsed:.1f}s | WPM: {wpm:.1f} | Accuracy: {accuracy:.1f}%"
+                last_stats_time = now
+            stats_text = cached_stats_text
         else:
             stats_text = "Start typing to begin..."
 
-        stdscr.addstr(max_y - 2, layout.left_margin, stats_text, curses.color_pair(3))
-        stdscr.addstr(max_y - 1, layout.left_margin, "ESC to quit", curses.A_DIM)
+        if stats_text != last_stats_text:
+            draw_status_line(stdscr, max_y - 2, layout.left_margin, stats_text, curses.color_pair(3))
+            last_stats_text = stats_text
 
-        stdscr.refresh()
+        # Stage the status lines, then the lesson pad on top, and send both in one terminal update
+        stdscr.noutrefresh()
+        show_lesson_pad(stdscr, lesson_pad, 2, layout)
+        curses.doupdate()
 
         # Check if lesson is complete
-        if position >= len(lesson.text):
+        if position >= lesson.length:
             break
 
-        # Get user input
+        # Get user input: block for one key, then drain any keys already queued
+        # (fast typing or a paste) so the whole burst costs a single redraw
         try:
-            key = stdscr.getch()
-            # Log all keys for debugging
-            logging.info(f"Got key: {key} ({repr(chr(key)) if 32 <= key <= 126 else 'non-printable'})")
+            keys = read_key_batch(stdscr)
         except KeyboardInterrupt:
             logging.info("KeyboardInterrupt received")
             break
         except Exception as e:
-            logging.exception(f"Exception during getch: {e}")
+            logging.exception("Exception during getch: %s", e)
             break
 
-        # Skip if no key available (shouldn't happen with blocking mode)
-        if key == -1:
-            logging.warning("Got -1 from getch (no input) - this shouldn't happen in blocking mode!")
-            continue
-
-        # Start timer on first keystroke
-        if stats.start_time is None:
-            stats.start()
-            logging.info("Timer started")
+        quit_requested = False
+        for key_index, key in enumerate(keys):
+            # Leave anything queued after the last character for the summary screen
+            if position >= lesson.length:
+                unread_keys(keys[key_index:])
+                break
 
-        # Handle ESC key to quit
-        if key == 27:  # ESC
-            logging.info("ESC pressed, exiting")
-            break
+            # Log all keys for debugging
+            if _DBG:
+                logging.debug("Got key: %d (%s)", key, repr(chr(key)) if 32 <= key <= 126 else 'non-printable')
+
+            # Skip if no key available (shouldn't happen with blocking mode)
+            if key == -1:
+                if _DBG:
+                    logging.debug("Got -1 from getch (no input) - this shouldn't happen in blocking mode!")
+                continue
+
+            # Start timer on first keystroke
+            if stats.start_time is None:
+                stats.start()
+                if _DBG:
+                    logging.debug("Timer started")
+
+            # Handle ESC key to quit
+            if key == 27:  # ESC
+                if _DBG:
+                    logging.debug("ESC pressed, exiting")
+                quit_requested = True
+                unread_keys(keys[key_index + 1:])
+                break
 
-        # Handle backspace
-        elif key in (curses.KEY_BACKSPACE, 127, 8):
-            logging.info(f"Backspace: position={position}, typed_chars='{typed_chars}'")
-            if len(typed_chars) > 0:
-                # Remove from typed chars buffer
-                typed_chars = typed_chars[:-1]
-            elif position > 0:
-                # If no errors, go back to previous character
-                position -= 1
-                typed_chars = ""
-
-        # Handle Enter/Return key
-        elif key in (10, 13, curses.KEY_ENTER):
-            # If there are errors, don't allow advancing
-            if typed_chars:
-                stats.record_keystroke(False)
-                typed_chars += '↵'
-                logging.info(f"Blocked Enter (must fix errors first) -> typed_chars='{typed_chars}'")
-            else:
-                expected_char = lesson.text[position]
-                is_correct = (expected_char == '\n')
-                stats.record_keystroke(is_correct)
-
-                if is_correct:
-                    # Correct Enter - advance position
-                    # Check if the current word had errors before moving to next line
-                    if current_word_had_error and position > 0:
-                        current_word, word_start = get_current_word(lesson.text, position - 1)
-                        if current_word and current_word.strip():  # Ensure it's not empty or whitespace
-                            stats.record_mistyped_word(current_word)
-                            logging.info(f"Recorded mistyped word: '{current_word}'")
-                        current_word_had_error = False  # Reset for next word
-
-                    position += 1
-                    typed_chars = ""
-                    logging.info(f"Correct Enter -> position={position}")
+            # Handle backspace
+            elif key in BACKSPACE_KEYS:
+                if _DBG:
+                    logging.debug("Backspace: position=%d, typed_chars=%r", position, typed_chars.decode())
+                if typed_chars:
+                    # Remove from typed chars buffer
+                    del typed_chars[-1]
+                elif position > 0:
+                    # If no errors, go back to previous character
+                    position -= 1
+                    typed_chars.clear()
+
+            # Handle Enter/Return key
+            elif key in ENTER_KEYS:
+                # If there are errors, don't allow advancing
+                if typed_chars:
+                    stats.record_keystroke(False)
+                    typed_chars.append(10)
+                    if _DBG:
+                        logging.debug("Blocked Enter (must fix errors first) -> typed_chars=%r", typed_chars.decode())
                 else:
-                    # Wrong - trying to press Enter when we shouldn't
-                    typed_chars += '↵'
+                    is_correct = (lesson_codes[position] == 10)
+                    stats.record_keystroke(is_correct)
+
+                    if is_correct:
+                        # Correct Enter - advance position
+                        # Check if the current word had errors before moving to next line
+                        if current_word_had_error and position > 0:
+                            current_word, word_start = words.get_word(position - 1)
+                            if current_word and current_word.strip():  # Ensure it's not empty or whitespace
+                                stats.record_mistyped_word(current_word)
+                                if _DBG:
+                                    logging.debug("Recorded mistyped word: %r", current_word)
+                            current_word_had_error = False  # Reset for next word
+
+                        position += 1
+                        typed_chars.clear()
+                        if _DBG:
+                            logging.debug("Correct Enter -> position=%d", position)
+                    else:
+                        # Wrong - trying to press Enter when we shouldn't
+                        typed_chars.append(10)
+                        current_word_had_error = True  # Mark current word as having errors
+                        if _DBG:
+                            logging.debug("Wrong Enter (expected %r) -> typed_chars=%r", lesson.text[position], typed_chars.decode())
+
+            # Handle printable characters
+            elif 32 <= key <= 126:
+                # If there are errors, don't allow advancing - only add to error buffer
+                if typed_chars:
+                    stats.record_keystroke(False)
+                    typed_chars.append(key)
                     current_word_had_error = True  # Mark current word as having errors
-                    logging.info(f"Wrong Enter (expected '{repr(expected_char)}') -> typed_chars='{typed_chars}'")
-
-        # Handle printable characters
-        elif 32 <= key <= 126:
-            char = chr(key)
-
-            # If there are errors, don't allow advancing - only add to error buffer
-            if typed_chars:
-                stats.record_keystroke(False)
-                typed_chars += char
-                current_word_had_error = True  # Mark current word as having errors
-                logging.info(f"Blocked '{char}' (must fix errors first) -> typed_chars='{typed_chars}'")
-            else:
-                expected_char = lesson.text[position]
-
-                # Record the keystroke
-                is_correct = (char == expected_char)
-                stats.record_keystroke(is_correct)
-
-                if is_correct:
-                    # Correct character - advance position
-                    # Check if we just completed a word (typed space or newline)
-                    if char in (' ', '\n') and current_word_had_error and position > 0:
-                        # Extract the word we just completed (the word before this space/newline)
-                        current_word, word_start = get_current_word(lesson.text, position - 1)
-                        if current_word and current_word.strip():  # Ensure it's not empty or whitespace
-                            stats.record_mistyped_word(current_word)
-                            logging.info(f"Recorded mistyped word: '{current_word}'")
-                        current_word_had_error = False  # Reset for next word
-
-                    position += 1
-                    typed_chars = ""
-                    logging.info(f"Correct '{char}' -> position={position}")
+                    if _DBG:
+                        logging.debug("Blocked %r (must fix errors first) -> typed_chars=%r", chr(key), typed_chars.decode())
                 else:
-                    # Wrong character - add to typed chars to show error
-                    typed_chars += char
-                    current_word_had_error = True  # Mark current word as having errors
-                    logging.info(f"Wrong '{char}' (expected '{expected_char}') -> typed_chars='{typed_chars}'")
+                    # Record the keystroke
+                    is_correct = (key == lesson_codes[position])
+                    stats.record_keystroke(is_correct)
+
+                    if is_correct:
+                        # Correct character - advance position
+                        # Check if we just completed a word (Enter is handled above, so only space)
+                        if key == SPACE_KEY and current_word_had_error and position > 0:
+                            # Extract the word we just completed (the word before this space/newline)
+                            current_word, word_start = words.get_word(position - 1)
+                            if current_word and current_word.strip():  # Ensure it's not empty or whitespace
+                                stats.record_mistyped_word(current_word)
+                                if _DBG:
+                                    logging.debug("Recorded mistyped word: %r", current_word)
+                            current_word_had_error = False  # Reset for next word
+
+                        position += 1
+                        typed_chars.clear()
+                        if _DBG:
+                            logging.debug("Correct %r -> position=%d", chr(key), position)
+                    else:
+                        # Wrong character - add to typed chars to show error
+                        typed_chars.append(key)
+                        current_word_had_error = True  # Mark current word as having errors
+                        if _DBG:
+                            logging.debug("Wrong %r (expected %r) -> typed_chars=%r", chr(key), lesson.text[position], typed_chars.decode())
+
+        if quit_requested:
+            break
 
     # Handle the last word if it had errors and wasn't followed by space/newline
     if current_word_had_error and position > 0:
-        current_word, word_start = get_current_word(lesson.text, position - 1)
+        current_word, word_start = words.get_word(position - 1)
         if current_word and current_word.strip():
             stats.record_mistyped_word(current_word)
-            logging.info(f"Recorded final mistyped word: '{current_word}'")
+            logging.info("Recorded final mistyped word: %r", current_word)
 
-    logging.info(f"Exiting typing_tutor loop, position={position}, lesson_length={len(lesson.text)}")
+    logging.info("Exiting typing_tutor loop, position=%d, lesson_length=%d", position, lesson.length)
     return stats
 
 
@@ -638,13 +947,6 @@ def show_summary(stdscr, stats: TypingStats, lesson_length: int, can_go_back: bo
     """
     logging.info("show_summary called")
 
-    # Make sure getch() blocks and waits for input
-    stdscr.keypad(True)
-    stdscr.nodelay(0)
-    curses.cbreak()
-    curses.noecho()
-    stdscr.timeout(-1)
-
     stdscr.clear()
     max_y, max_x = stdscr.getmaxyx()
 
@@ -720,7 +1022,7 @@ def show_summary(stdscr, stats: TypingStats, lesson_length: int, can_go_back: bo
     while True:
         logging.info("Waiting for key press in summary...")
         key = stdscr.getch()
-        logging.info(f"Got key {key} in summary")
+        logging.info("Got key %d in summary", key)
 
         # Check which action was requested
         if key in (ord('r'), ord('R')):
@@ -736,10 +1038,101 @@ def show_summary(stdscr, stats: TypingStats, lesson_length: int, can_go_back: bo
         # If invalid key, loop continues (do nothing)
 
 
+def _on_repeat(lesson_stack: deque[Lesson], stats: TypingStats, args: argparse.Namespace, library_path: Optional[str]) -> bool:
+    """Repeat current lesson - it stays on top of the stack"""
+    return True
+
+
+def _on_mistakes(lesson_stack: deque[Lesson], stats: TypingStats, args: argparse.Namespace, library_path: Optional[str]) -> bool:
+    """Create new lesson from mistyped words"""
+    top_mistyped = stats.get_top_mistyped_words(10)
+    if top_mistyped:
+        mistake_lesson_text = create_bag_shuffle_lesson(map(itemgetter(0), top_mistyped), 3)
+        # Mistake lessons have no source
+        mistake_lesson = Lesson(text=mistake_lesson_text, source=None)
+        lesson_stack.append(mistake_lesson)
+        logging.info("Created mistake lesson: %.50s...", mistake_lesson_text)
+    return True
+
+
+def _on_new(lesson_stack: deque[Lesson], stats: TypingStats, args: argparse.Namespace, library_path: Optional[str]) -> bool:
+    """Load a new random text from library"""
+    loaded = load_text(None, None, library_path)
+    new_lesson_text = generate_lesson(loaded.text, args.repeats, args.shuffle)
+    # Add new lesson to stack with its source
+    new_lesson = Lesson(text=new_lesson_text, source=loaded.source)
+    lesson_stack.append(new_lesson)
+    logging.info("Created new lesson from library: %.50s...", new_lesson_text)
+    return True
+
+
+def _on_back(lesson_stack: deque[Lesson], stats: TypingStats, args: argparse.Namespace, library_path: Optional[str]) -> bool:
+    """Go back to previous lesson"""
+    if len(lesson_stack) > 1:
+        lesson_stack.pop()
+        logging.info("Went back, stack depth now: %d", len(lesson_stack))
+    return True
+
+
+def _on_quit(lesson_stack: deque[Lesson], stats: TypingStats, args: argparse.Namespace, library_path: Optional[str]) -> bool:
+    """Exit program"""
+    return False
+
+
+# Summary choice -> handler that updates the lesson stack; False ends the session
+SUMMARY_ACTIONS = {
+    "repeat": _on_repeat,
+    "mistakes": _on_mistakes,
+    "new": _on_new,
+    "back": _on_back,
+    "quit": _on_quit,
+}
+
+
+def _run_one_lesson(stdscr, lesson_stack: deque[Lesson], args: argparse.Namespace, library_path: Optional[str]) -> bool:
+    """Type the lesson on top of the stack and act on the summary choice; returns False to quit"""
+    # Get current lesson from top of stack
+    current_lesson = lesson_stack[-1]
+    logging.info("Current lesson (stack depth=%d): %.50s...", len(lesson_stack), current_lesson.text)
+
+    # Run typing tutor
+    logging.info("Calling typing_tutor")
+    stats = typing_tutor(stdscr, current_lesson)
+    logging.info("typing_tutor returned, stats: keystrokes=%d", stats.total_keystrokes)
+
+    # User quit without typing anything
+    if stats.total_keystrokes == 0:
+        return False
+
+    # Show summary
+    logging.info("Showing summary")
+    can_go_back = len(lesson_stack) > 1
+    in_library_mode = library_path is not None
+    action = show_summary(stdscr, stats, current_lesson.length, can_go_back, in_library_mode)
+    logging.info("Action = %s", action)
+
+    # Unknown actions end the session, like quit
+    handler = SUMMARY_ACTIONS.get(action)
+    return handler is not None and handler(lesson_stack, stats, args, library_path)
+
+
+def run_lessons(stdscr, lesson_stack: deque[Lesson], args: argparse.Namespace, library_path: Optional[str]):
+    """Type lessons from the stack and act on the summary choices until the user quits"""
+    _init_curses(stdscr)
+
+    # One handler for the whole session rather than one per lesson
+    try:
+        while _run_one_lesson(stdscr, lesson_stack, args, library_path):
+            pass
+    except KeyboardInterrupt:
+        logging.info("KeyboardInterrupt in main")
+    except Exception:
+        logging.exception("Exception in main")
+        raise
+
+
 def main():
     """Main entry point"""
-    logging.info("=== Starting just-type-it ===")
-
     parser = argparse.ArgumentParser(
         description="A CLI typing tutor with a slick TUI interface"
     )
@@ -766,22 +1159,30 @@ def main():
         action='store_true',
         help='Shuffle words in the lesson text'
     )
+    parser.add_argument(
+        '--debug',
+        action='store_true',
+        help=f'Write a debug log to {DEBUG_LOG_FILE} (also enabled by setting JTI_DEBUG=1)'
+    )
 
     args = parser.parse_args()
-    logging.info(f"Args: input={args.input}, text={args.text}, library={args.library}, repeats={args.repeats}, shuffle={args.shuffle}")
+    # JTI_DEBUG=0/false/no/off (or empty) leaves debug logging off like an unset variable
+    env_debug = os.environ.get('JTI_DEBUG', '').strip().lower() not in DEBUG_ENV_OFF_VALUES
+    setup_logging(args.debug or env_debug)
+    logging.info("=== Starting just-type-it ===")
+    logging.info("Args: input=%s, text=%s, library=%s, repeats=%s, shuffle=%s", args.input, args.text, args.library, args.repeats, args.shuffle)
 
     # Store library path for later use
     library_path = args.library
-    in_library_mode = library_path is not None
 
     # Load and generate lesson text
     loaded = load_text(args.text, args.input, library_path)
-    logging.info(f"Loaded text: {loaded.text[:100]}...")
+    logging.info("Loaded text: %.100s...", loaded.text)
     if loaded.source:
-        logging.info(f"Source: {loaded.source}")
+        logging.info("Source: %s", loaded.source)
 
     lesson_text = generate_lesson(loaded.text, args.repeats, args.shuffle)
-    logging.info(f"Generated lesson (length={len(lesson_text)}): {lesson_text[:100]}...")
+    logging.info("Generated lesson (length=%d): %.100s...", len(lesson_text), lesson_text)
 
     if not lesson_text:
         logging.error("No lesson text available")
@@ -791,65 +1192,13 @@ def main():
     # Create initial lesson with source
     initial_lesson = Lesson(text=lesson_text, source=loaded.source)
 
-    # Run the typing tutor with lesson stack
-    lesson_stack = [initial_lesson]  # Start with original lesson
-
-    while True:
-        try:
-            # Get current lesson from top of stack
-            current_lesson = lesson_stack[-1]
-            logging.info(f"Current lesson (stack depth={len(lesson_stack)}): {current_lesson.text[:50]}...")
-
-            # Run typing tutor
-            logging.info("Calling curses.wrapper(typing_tutor)")
-            stats = curses.wrapper(typing_tutor, current_lesson)
-            logging.info(f"typing_tutor returned, stats: keystrokes={stats.total_keystrokes}")
-
-            # Show summary if user typed anything
-            if stats.total_keystrokes > 0:
-                logging.info("Showing summary")
-                can_go_back = len(lesson_stack) > 1
-                action = curses.wrapper(show_summary, stats, len(current_lesson.text), can_go_back, in_library_mode)
-                logging.info(f"Action = {action}")
-
-                if action == "repeat":
-                    # Repeat current lesson - just continue loop
-                    continue
-                elif action == "mistakes":
-                    # Create new lesson from mistyped words
-                    top_words = [word for word, _ in stats.get_top_mistyped_words(10)]
-                    if top_words:
-                        mistake_lesson_text = create_bag_shuffle_lesson(top_words, 3)
-                        # Mistake lessons have no source
-                        mistake_lesson = Lesson(text=mistake_lesson_text, source=None)
-                        lesson_stack.append(mistake_lesson)
-                        logging.info(f"Created mistake lesson: {mistake_lesson_text[:50]}...")
-                elif action == "new":
-                    # Load a new random text from library
-                    loaded = load_text(None, None, library_path)
-                    new_lesson_text = generate_lesson(loaded.text, args.repeats, args.shuffle)
-                    # Add new lesson to stack with its source
-                    new_lesson = Lesson(text=new_lesson_text, source=loaded.source)
-                    lesson_stack.append(new_lesson)
-                    logging.info(f"Created new lesson from library: {new_lesson_text[:50]}...")
-                elif action == "back":
-                    # Go back to previous lesson
-                    if len(lesson_stack) > 1:
-                        lesson_stack.pop()
-                        logging.info(f"Went back, stack depth now: {len(lesson_stack)}")
-                elif action == "quit":
-                    # Exit program
-                    break
-            else:
-                # User quit without typing anything
-                break
-
-        except KeyboardInterrupt:
-            logging.info("KeyboardInterrupt in main")
-            break
-        except Exception as e:
-            logging.exception("Exception in main")
-            raise
+    # Run the typing tutor with lesson stack, in one curses session for every lesson
+    lesson_stack = deque([initial_lesson], maxlen=MAX_LESSON_HISTORY)  # Start with original lesson
+    try:
+        curses.wrapper(run_lessons, lesson_stack, args, library_path)
+    except KeyboardInterrupt:
+        # Raised while curses was starting up or shutting down
+        logging.info("KeyboardInterrupt in main")
 
 
 if __name__ == '__main__':